@@ -1,25 +1,231 @@
-import datetime
-
-import pandas as pd
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import requests
 import streamlit as st
+from azure.core.exceptions import AzureError
+from PIL import Image, ImageOps, UnidentifiedImageError
+from query_utils import is_read_only_query, normalize_query
+from requests.adapters import HTTPAdapter
 from services.blob_service import BlobStorageService
 from services.credit_card_service import CreditCardValidator
 from services.data_base import DatabaseService
-from streamlit_lottie import st_lottie
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+# Sidebar menu entries and their pre-rendered labels
+MENU_OPTIONS = {
+    "Home": "🏠",
+    "Card Analysis": "💳",
+    "Database Query": "🔍",
+    "Documentation": "📚",
+    "About": "ℹ️",
+}
+MENU_KEYS = list(MENU_OPTIONS)
+MENU_LABELS = [f"{key} {icon}" for key, icon in MENU_OPTIONS.items()]
+LABEL_TO_KEY = dict(zip(MENU_LABELS, MENU_KEYS))
+
+
+# Azure-backed services are created once per process and shared across reruns
+# and sessions; the database service is kept per thread
+@st.cache_resource
+def get_credit_card_validator():
+    """Returns the shared credit card validator."""
+    return CreditCardValidator()
+
+
+@st.cache_resource
+def get_blob_storage_service():
+    """Returns the shared Blob Storage service."""
+    return BlobStorageService()
 
-# Global services initialization
-CREDIT_CARD_VALIDATOR = CreditCardValidator()
-BLOB_STORAGE_SERVICE = BlobStorageService()
-DATABASE_SERVICE = DatabaseService()
+
+@st.cache_resource
+def _thread_local():
+    """Holds per-thread resources that must not cross threads."""
+    return threading.local()
+
+
+def get_database_service():
+    """
+    Returns the database service of the current thread.
+
+    Each thread gets its own instance, since a sqlite3 connection may only be
+    used by the thread that created it.
+    """
+    local = _thread_local()
+    if not hasattr(local, "database_service"):
+        local.database_service = DatabaseService()
+    return local.database_service
+
+
+@st.cache_resource
+def get_http_session():
+    """Returns a shared HTTP session with a connection pool."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def _fetch_lottie(url: str):
+    """Fetches and caches animation JSON. Raises on failure so errors aren't cached."""
+    r = get_http_session().get(url, timeout=5)
+    r.raise_for_status()
+    return r.json()
 
 
+@st.cache_data(ttl=60, show_spinner=False)
 def load_lottie(url: str):
-    """Loads animation from Lottie Files."""
-    r = requests.get(url)
-    if r.status_code != 200:
+    """Loads animation from Lottie Files. Failures are cached for a minute."""
+    try:
+        return _fetch_lottie(url)
+    except (requests.RequestException, ValueError):
         return None
-    return r.json()
+
+
+@st.cache_resource
+def _data_state():
+    """Holds the data version shared by all sessions, bumped on every write."""
+    return {"version": 0}
+
+
+def _bump_data_version():
+    """Invalidates cached query results after the table changes."""
+    _data_state()["version"] += 1
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_all_cards(version: int):
+    """Returns all cards for the given data version."""
+    return get_database_service().get_all_cards()
+
+
+@st.cache_data(ttl=300, max_entries=1024, show_spinner=False)
+def _get_card_by_number(card_number: str, version: int):
+    """Returns the card with the given number for the given data version."""
+    return get_database_service().get_card_by_number(card_number)
+
+
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _run_query(sql_norm: str, version: int, _query: str):
+    """Returns the results of a read-only query for the given data version."""
+    return get_database_service().execute_custom_query(_query)
+
+
+def run_custom_query(query: str):
+    """
+    Executes a custom SELECT query, serving repeated queries from cache.
+
+    Args:
+        query (str): SQL query entered by the user
+
+    Returns:
+        list: Query results
+
+    Raises:
+        ValueError: If the query is not a single SELECT statement
+    """
+    if not is_read_only_query(query):
+        raise ValueError(
+            "Only a single SELECT statement (optionally starting with WITH) "
+            "is allowed."
+        )
+    return _run_query(
+        normalize_query(query), _data_state()["version"], query.strip()
+    )
+
+
+def rows_to_table(rows: list):
+    """
+    Builds an Arrow table from query rows.
+
+    SQLite columns may hold mixed types, so a column Arrow cannot type
+    consistently is converted to strings.
+
+    Args:
+        rows (list): Rows as dictionaries
+
+    Returns:
+        pa.Table: Table with one column per key found in the rows
+    """
+    columns = dict.fromkeys(key for row in rows for key in row)
+    arrays = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        try:
+            arrays[column] = pa.array(values)
+        except pa.ArrowException:
+            arrays[column] = pa.array(
+                [None if value is None else str(value) for value in values],
+                type=pa.string(),
+            )
+    return pa.table(arrays)
+
+
+def table_to_csv(table: pa.Table):
+    """
+    Serializes an Arrow table to CSV.
+
+    Args:
+        table (pa.Table): Table to serialize
+
+    Returns:
+        bytes: CSV content
+    """
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+def table_to_parquet(table: pa.Table):
+    """
+    Serializes an Arrow table to Snappy-compressed Parquet.
+
+    Args:
+        table (pa.Table): Table to serialize
+
+    Returns:
+        bytes: Parquet content
+    """
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression="snappy")
+    return sink.getvalue().to_pybytes()
+
+
+# Serializers for each export format offered on the Database Query page
+TABLE_WRITERS = {
+    "csv": table_to_csv,
+    "parquet": table_to_parquet,
+}
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _all_cards_export(version: int, fmt: str):
+    """Returns all cards serialized in the given format."""
+    return TABLE_WRITERS[fmt](rows_to_table(_load_all_cards(version)))
+
+
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def _query_export(sql_norm: str, version: int, fmt: str, _table: pa.Table):
+    """Returns a query result serialized in the given format."""
+    return TABLE_WRITERS[fmt](_table)
+
+
+def _prefetch_all_cards(version: int):
+    """Warms the all-cards cache; the page reports errors when it loads the data."""
+    try:
+        _load_all_cards(version)
+    except Exception:
+        logger.exception("Prefetching all cards failed")
 
 
 def render_sidebar():
@@ -29,60 +235,93 @@ def render_sidebar():
     Returns:
         str: Selected page in the menu
     """
-    menu_options = {
-        "Home": "🏠",
-        "Card Analysis": "💳",
-        "Database Query": "🔍",
-        "Documentation": "📚",
-        "About": "ℹ️",
-    }
-
-    selected_page = st.sidebar.radio(
-        "Menu",
-        list(menu_options.keys()),
-        format_func=lambda x: f"{x} {menu_options[x]}",
-    )
+    label = st.sidebar.radio("Menu", MENU_LABELS)
 
-    return selected_page
+    # Load the table ahead of the first visit to the Database Query page
+    if not st.session_state.get("prefetched"):
+        st.session_state["prefetched"] = True
+        thread = threading.Thread(
+            target=_prefetch_all_cards,
+            args=(_data_state()["version"],),
+            daemon=True,
+        )
+        add_script_run_ctx(thread)
+        thread.start()
 
+    return LABEL_TO_KEY[label]
 
-def process_card_analysis(uploaded_file):
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _analyze_card_image(digest: str, _file_name: str, _file: bytes):
     """
-    Processes the uploaded credit card image.
+    Uploads and analyzes a card image. Results are cached by content hash;
+    failures raise and are not cached.
 
     Args:
-        uploaded_file (UploadedFile): Uploaded image file
+        digest (str): SHA-256 of the image content
+        _file_name (str): Name of the uploaded file
+        _file (bytes): Image content
 
     Returns:
-        tuple: Card information and validation result, or None
+        tuple: Card information and validation result
+
+    Raises:
+        ValueError: If the upload or the analysis fails
     """
     try:
-        st.image(uploaded_file, caption="Card Image", use_column_width=True)
+        blob_url = get_blob_storage_service().upload_blob(_file, _file_name)
+    except (AzureError, requests.RequestException) as e:
+        raise ValueError(f"Error uploading image to Blob Storage: {e}") from e
 
-        with st.spinner("Processing..."):
-            file_name = uploaded_file.name
-            file = uploaded_file.getvalue()
-            blob_url = BLOB_STORAGE_SERVICE.upload_blob(file, file_name)
+    if not blob_url:
+        raise ValueError("Error uploading image to Blob Storage.")
 
-            if not blob_url:
-                st.error("Error uploading image to Blob Storage.")
-                return None
+    validator = get_credit_card_validator()
+    try:
+        card_info = validator.detect_credit_card_info_from_url(blob_url)
+    except (AzureError, requests.RequestException) as e:
+        raise ValueError(f"Error during card analysis: {e}") from e
 
-            card_info = CREDIT_CARD_VALIDATOR.detect_credit_card_info_from_url(
-                blob_url)
-            if not card_info:
-                st.error("Unable to analyze card.")
-                return None
+    if not card_info:
+        raise ValueError("Unable to analyze card.")
 
-            validation_result = CREDIT_CARD_VALIDATOR.validate_card_info(
-                card_info)
-            return card_info, validation_result
+    validation_result = validator.validate_card_info(card_info)
+    return card_info, validation_result
 
-    except Exception as e:
-        st.error(f"Error during card analysis: {e}")
+
+def process_card_analysis(uploaded_file):
+    """
+    Processes the uploaded credit card image.
+
+    Args:
+        uploaded_file (UploadedFile): Uploaded image file
+
+    Returns:
+        tuple: Card information and validation result, or None
+    """
+    # Send a downscaled preview instead of the full-resolution upload
+    try:
+        preview = ImageOps.exif_transpose(Image.open(uploaded_file))
+        preview.thumbnail((640, 400), Image.Resampling.BILINEAR)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        st.error(f"Unable to read image: {e}")
         return None
+    st.image(preview, caption="Card Image")
+
+    with st.spinner("Processing..."):
+        file_name = uploaded_file.name
+        file = uploaded_file.getvalue()
+
+        # Identical images are served from cache, keyed by content hash
+        digest = hashlib.sha256(file).hexdigest()
+        try:
+            return _analyze_card_image(digest, file_name, file)
+        except ValueError as e:
+            st.error(str(e))
+            return None
 
 
+@st.fragment
 def database_query_page():
     """
     Database query page that automatically displays all data
@@ -93,19 +332,25 @@ def database_query_page():
     # Automatically display all data when loading the page
     st.subheader("📊 All Records in `credit_cards` Table")
     try:
-        all_data = DATABASE_SERVICE.get_all_cards()
+        version = _data_state()["version"]
+        all_data = _load_all_cards(version)
         if all_data:
-            df_all = pd.DataFrame(all_data)
-            st.dataframe(df_all, use_container_width=True)
+            table_all = rows_to_table(all_data)
+            st.dataframe(table_all, use_container_width=True)
 
-            # Button to export all data as CSV
-            csv_all = df_all.to_csv(index=False)
+            # Buttons to export all data as CSV or Parquet
             st.download_button(
                 label="💾 Download All Data (CSV)",
-                data=csv_all,
+                data=_all_cards_export(version, "csv"),
                 file_name="all_credit_cards_data.csv",
                 mime="text/csv",
             )
+            st.download_button(
+                label="💾 Download All Data (Parquet)",
+                data=_all_cards_export(version, "parquet"),
+                file_name="all_credit_cards_data.parquet",
+                mime="application/octet-stream",
+            )
         else:
             st.info("⚠️ No data found in `credit_cards` table.")
     except Exception as e:
@@ -134,21 +379,30 @@ def database_query_page():
     if st.button("Execute Query"):
         try:
             # Execute custom query
-            results = DATABASE_SERVICE.execute_custom_query(query)
+            results = run_custom_query(query)
 
             if results:
-                # Convert results to DataFrame
-                df_results = pd.DataFrame(results)
-                st.dataframe(df_results, use_container_width=True)
+                # Convert results to an Arrow table
+                table_results = rows_to_table(results)
+                st.dataframe(table_results, use_container_width=True)
 
-                # Button to export results as CSV
-                csv_results = df_results.to_csv(index=False)
+                # Buttons to export results as CSV or Parquet
+                sql_norm = normalize_query(query)
+                version = _data_state()["version"]
                 st.download_button(
                     label="💾 Download Results (CSV)",
-                    data=csv_results,
+                    data=_query_export(sql_norm, version, "csv", table_results),
                     file_name="query_results.csv",
                     mime="text/csv",
                 )
+                st.download_button(
+                    label="💾 Download Results (Parquet)",
+                    data=_query_export(
+                        sql_norm, version, "parquet", table_results
+                    ),
+                    file_name="query_results.parquet",
+                    mime="application/octet-stream",
+                )
             else:
                 st.info("🔍 No results found for the query.")
         except ValueError as ve:
@@ -157,10 +411,13 @@ def database_query_page():
             st.error(f"❌ Error executing query: {e}")
 
 
+@st.fragment
 def home_page():
     """
     Renders the home page with project description.
     """
+    from streamlit_lottie import st_lottie
+
     st.title("🌟 Simplifying Card Validation in E-commerce")
     # Load animation
     lottie_translate = load_lottie(
@@ -186,7 +443,7 @@ def home_page():
       - Automatic information detection without typing
       - Intuitive and friendly interface
       - Storage for future analysis
-      - Easy queries with CSV export
+      - Easy queries with CSV and Parquet export
       #### 🔍 Exploring the Project
       This is a demonstration project that uses cutting-edge Azure technologies
       to show how to implement card validation efficiently. Although it's a
@@ -204,6 +461,7 @@ def home_page():
     )
 
 
+@st.fragment
 def documentation_page():
     """
     Renders the documentation page.
@@ -224,7 +482,7 @@ def documentation_page():
       * **Card Validation:** Performs basic validation of the card number and expiration date.
       * **Data Storage:** Stores card information (including validation result) in a SQLite database.
       * **Data Query:** Allows querying stored data using SQL queries.
-      * **Data Export:** Allows exporting query results to a CSV file.
+      * **Data Export:** Allows exporting query results to a CSV or Parquet file.
 
       ## Architecture
 
@@ -245,6 +503,7 @@ def documentation_page():
     )
 
 
+@st.fragment
 def about_page():
     """
     Renders the about page.
@@ -280,6 +539,7 @@ def about_page():
     )
 
 
+@st.fragment
 def card_analysis_page():
     """
     Page for credit card analysis.
@@ -299,8 +559,8 @@ def card_analysis_page():
 
             if validation_result["is_valid"]:
                 st.success("✅ Valid Card")
-                existing_card = DATABASE_SERVICE.get_card_by_number(
-                    card_info["card_number"]
+                existing_card = _get_card_by_number(
+                    card_info["card_number"], _data_state()["version"]
                 )
 
                 if existing_card:
@@ -309,13 +569,26 @@ def card_analysis_page():
                     )
                 else:
                     card_info["is_valid"] = validation_result["is_valid"]
-                    card_info["processed_at"] = datetime.datetime.now().isoformat()
-                    DATABASE_SERVICE.insert_card(card_info)
+                    card_info["processed_at"] = datetime.now(timezone.utc).isoformat(
+                        timespec="seconds"
+                    )
+                    get_database_service().insert_card(card_info)
+                    _bump_data_version()
                     st.success("Card inserted into database!")
             else:
                 st.error("❌ Invalid Card")
 
 
+# Page mapping
+PAGE_HANDLERS = {
+    "Home": home_page,
+    "Card Analysis": card_analysis_page,
+    "Database Query": database_query_page,
+    "Documentation": documentation_page,
+    "About": about_page,
+}
+
+
 def main():
     """
     Entry point for the Credit Card Analyzer application.
@@ -323,18 +596,8 @@ def main():
     st.set_page_config(page_title="Credit Card Analyzer",
                        page_icon="💳", layout="wide")
 
-    # Page mapping
-    page_handlers = {
-        "Home": home_page,
-        "Card Analysis": card_analysis_page,
-        "Database Query": database_query_page,
-        "Documentation": documentation_page,
-        "About": about_page,
-    }
-
     # Render selected page
-    selected_page = render_sidebar()
-    handler = page_handlers.get(selected_page)
+    handler = PAGE_HANDLERS.get(render_sidebar())
 
     if handler:
         handler()
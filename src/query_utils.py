@@ -0,0 +1,99 @@
+import re
+
+# SQL lexical elements: comments, quoted literals and identifiers, statement
+# separators, whitespace and everything else. Unterminated block comments run
+# to the end of the input, as in SQLite.
+_SQL_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<quoted>'(?:[^']|'')*'|"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+    | (?P<semicolon>;)
+    | (?P<space>\s+)
+    | (?P<word>[^\s'"`\[;/-]+|.)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+# Custom queries must be a single SELECT, optionally preceded by a WITH clause
+_READ_QUERY_RE = re.compile(r"^(select|with)\b", re.IGNORECASE)
+_WRITE_KEYWORD_RE = re.compile(
+    r"\b(insert|update|delete|create|drop|alter)\b|\breplace\s+into\b",
+    re.IGNORECASE,
+)
+
+
+def tokenize_sql(query: str):
+    """
+    Splits a query into tokens, dropping comments and whitespace.
+
+    Args:
+        query (str): SQL query
+
+    Returns:
+        list: (kind, text, separated) tuples, where kind is "quoted",
+        "semicolon" or "word" and separated tells whether whitespace or a
+        comment preceded the token
+    """
+    tokens = []
+    separated = False
+    for match in _SQL_TOKEN_RE.finditer(query):
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            separated = True
+            continue
+        tokens.append((kind, match.group(), separated))
+        separated = False
+    return tokens
+
+
+def _statement_tokens(query: str):
+    """Returns the tokens of a query without its trailing semicolon."""
+    tokens = tokenize_sql(query)
+    if tokens and tokens[-1][0] == "semicolon":
+        tokens.pop()
+    return tokens
+
+
+def normalize_query(query: str):
+    """
+    Builds the cache key of a query. Comments are removed, whitespace between
+    tokens is collapsed and literals and quoted identifiers are kept verbatim.
+
+    Args:
+        query (str): SQL query entered by the user
+
+    Returns:
+        str: Normalized query
+    """
+    parts = []
+    for _, text, separated in _statement_tokens(query):
+        if separated and parts:
+            parts.append(" ")
+        parts.append(text)
+    return "".join(parts)
+
+
+def is_read_only_query(query: str):
+    """
+    Checks that a query is a single SELECT statement, optionally with a WITH
+    clause. Comments, literals and quoted identifiers are ignored.
+
+    Args:
+        query (str): SQL query entered by the user
+
+    Returns:
+        bool: True if the query may be executed
+    """
+    tokens = _statement_tokens(query)
+    if any(kind == "semicolon" for kind, _, _ in tokens):
+        return False
+    # Literals and quoted identifiers are masked so their content is ignored
+    code = " ".join(
+        text if kind == "word" else "?" for kind, text, _ in tokens
+    )
+    if not _READ_QUERY_RE.match(code):
+        return False
+    # SQLite allows WITH clauses in front of INSERT, UPDATE and DELETE
+    if code[:4].lower() == "with":
+        return not _WRITE_KEYWORD_RE.search(code)
+    return True
@@ -0,0 +1,66 @@
+import pytest
+from query_utils import is_read_only_query, normalize_query
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT * FROM credit_cards",
+        "  select * from credit_cards ; ",
+        "SELECT * FROM credit_cards WHERE card_name = 'A;B';",
+        "SELECT * FROM credit_cards WHERE bank_name = 'delete'",
+        'SELECT "update" FROM credit_cards',
+        "SELECT [drop;] FROM credit_cards",
+        "SELECT `x;y` FROM credit_cards",
+        "SELECT id -- ; DELETE FROM credit_cards\nFROM credit_cards",
+        "WITH x AS (SELECT 1) SELECT * FROM x",
+        "WITH x AS (SELECT replace(card_name, ' ', '') AS n FROM credit_cards) "
+        "SELECT n FROM x",
+    ],
+)
+def test_read_only_queries_are_allowed(query):
+    assert is_read_only_query(query)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "",
+        "DELETE FROM credit_cards",
+        "SELECT 1; DROP TABLE credit_cards",
+        "SELECT 1 /* ' */; DELETE FROM credit_cards; /* ' */",
+        "WITH x AS (SELECT 1) /* ' */ DELETE FROM credit_cards /* ' */",
+        "WITH x AS (SELECT 1) -- '\nDELETE FROM credit_cards -- '",
+        "WITH x AS (SELECT 1) REPLACE INTO credit_cards (id) VALUES (1)",
+        "'x' SELECT 1",
+        "/* SELECT */ DELETE FROM credit_cards",
+        "selected",
+    ],
+)
+def test_writes_and_multiple_statements_are_rejected(query):
+    assert not is_read_only_query(query)
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        (
+            "SELECT * FROM credit_cards -- c\nWHERE id = 1",
+            "SELECT * FROM credit_cards -- c WHERE id = 1",
+        ),
+        (
+            "SELECT * FROM credit_cards WHERE card_name = 'GABRIEL  LIMA'",
+            "SELECT * FROM credit_cards WHERE card_name = 'GABRIEL LIMA'",
+        ),
+        ("SELECT [card  name] FROM credit_cards", "SELECT [card name] FROM credit_cards"),
+        ("SELECT `card  name` FROM credit_cards", "SELECT `card name` FROM credit_cards"),
+    ],
+)
+def test_different_queries_get_different_keys(first, second):
+    assert normalize_query(first) != normalize_query(second)
+
+
+def test_equivalent_queries_share_a_key():
+    assert normalize_query(
+        "SELECT *\n  FROM credit_cards /* all */ WHERE id = 1 ;"
+    ) == normalize_query("SELECT * FROM credit_cards WHERE id = 1")